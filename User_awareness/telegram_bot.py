@@ -1,4 +1,4 @@
-"""Simple Telegram bot using telepot and requests.
+"""Simple Telegram bot using telepot and urllib3.
 
 Set envs:
 - TELEGRAM_BOT_TOKEN
@@ -11,12 +11,24 @@ import os
 import time
 import shlex
 import json
-import requests
+import hashlib
+import threading
+import concurrent.futures
+import urllib3
 import telepot
 from telepot.loop import MessageLoop
 from telepot.namedtuple import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional fast path
+    orjson = None
+
+# orjson works straight on bytes ~3-5x faster than the stdlib module.
+_loads = orjson.loads if orjson else json.loads
+_dumps = orjson.dumps if orjson else (lambda obj: json.dumps(obj).encode("utf-8"))
+
 REGISTRY_API = os.getenv("REGISTRY_API_URL", "http://localhost:8080")
 TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 PERMISSIONS_PATH = os.getenv("PERMISSIONS_PATH", "./catalog/permissions.json")
@@ -25,9 +37,49 @@ ALERT_POLL_SEC = int(os.getenv("ALERT_POLL_SEC", "30"))
 ALERT_COOLDOWN_SEC = int(os.getenv("ALERT_COOLDOWN_SEC", "120"))
 
 KNOWN_CHATS = set()
+# Deduplicated, sorted snapshot of KNOWN_CHATS; broadcast loops walk this
+# immutable tuple so iteration never races a concurrent /start registration.
+_CHATS_SNAPSHOT = ()
 _last_alert = {}
 
 
+def register_chat(chat_id):
+    global _CHATS_SNAPSHOT
+    if chat_id not in KNOWN_CHATS:
+        KNOWN_CHATS.add(chat_id)
+        _CHATS_SNAPSHOT = tuple(sorted(KNOWN_CHATS))
+
+# Fixed endpoints get their full URL built once; dynamic paths (delete by id,
+# driven by chat input) are formatted on the fly so the cache stays bounded.
+_BASE_URL = REGISTRY_API.rstrip("/")
+_URL_CACHE = {
+    endpoint: f"{_BASE_URL}/{endpoint}"
+    for endpoint in ("status", "labs", "sensors", "actuators", "command", "command/bulk", "alerts/stream")
+}
+
+
+def _url(endpoint):
+    url = _URL_CACHE.get(endpoint)
+    if url is not None:
+        return url
+    return f"{_BASE_URL}/{endpoint.lstrip('/')}"
+
+# Shared connection pool so registry calls reuse Keep-Alive sockets instead of
+# paying a TCP handshake per request; bare urllib3 skips the per-call cookie
+# and hook machinery a requests.Session would run.
+POOL = urllib3.PoolManager(num_pools=2, maxsize=16, retries=False)
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Pool for fanning registry calls out concurrently (POOL is thread-safe).
+EXEC = concurrent.futures.ThreadPoolExecutor(max_workers=8)
+
+# Short-lived /status cache so overlapping callers (alert poller, turn-all
+# actuator discovery) share one response instead of re-fetching the same JSON.
+_STATUS_TTL = 2.0
+_STATUS_CACHE = {"t": 0.0, "v": None}
+_STATUS_LOCK = threading.Lock()
+
+
 def load_permissions():
     try:
         with open(PERMISSIONS_PATH, "r", encoding="utf-8") as fh:
@@ -65,104 +117,367 @@ def get_labs():
 
 
 def _get(endpoint):
-    url = f"{REGISTRY_API.rstrip('/')}/{endpoint.lstrip('/')}"
     try:
-        r = requests.get(url, timeout=5)
-        r.raise_for_status()
-        return r.json()
+        r = POOL.request("GET", _url(endpoint), timeout=5)
+        if r.status >= 400:
+            return {"error": "registry unreachable"}
+        return _loads(r.data)
     except Exception:
         return {"error": "registry unreachable"}
 
 
+# Shared result for the registry's fixed success shape; command handlers only
+# ever read "ok"/"error", so the body never needs a full JSON parse.
+_OK_RESULT = {"ok": True}
+
+
+def _parse_result(body):
+    if body.startswith(b'{"ok": true') or body.startswith(b'{"ok":true'):
+        return _OK_RESULT
+    return _loads(body)
+
+
 def _post(endpoint, payload):
-    url = f"{REGISTRY_API.rstrip('/')}/{endpoint.lstrip('/')}"
     try:
-        r = requests.post(url, json=payload, timeout=5)
-        r.raise_for_status()
-        return r.json()
+        r = POOL.request("POST", _url(endpoint), body=_dumps(payload), headers=_JSON_HEADERS, timeout=5)
+        if r.status >= 400:
+            return {"error": "registry unreachable"}
+        return _parse_result(r.data)
     except Exception:
         return {"error": "registry unreachable"}
 
 
+def _get_status_cached():
+    now = time.time()
+    if _STATUS_CACHE["v"] is not None and now - _STATUS_CACHE["t"] < _STATUS_TTL:
+        return _STATUS_CACHE["v"]
+    with _STATUS_LOCK:
+        # Re-check under the lock so concurrent misses coalesce into one fetch.
+        now = time.time()
+        if _STATUS_CACHE["v"] is not None and now - _STATUS_CACHE["t"] < _STATUS_TTL:
+            return _STATUS_CACHE["v"]
+        data = _get("status")
+        if not data.get("error"):
+            _STATUS_CACHE["v"] = data
+            _STATUS_CACHE["t"] = now
+        return data
+
+
 def fmt_status(data):
     labs = data.get("labs", [])
     if not labs:
         return "No labs registered."
     lines = []
-    for lab in labs:
-        lines.append(f"🏷 {lab.get('lab_id')} ({lab.get('name','')})")
-        thr = lab.get("thresholds", {})
+    for i, lab in enumerate(labs):
+        if i:
+            lines.append("")
+        lab_get = lab.get
+        lines.append(f"🏷 {lab_get('lab_id')} ({lab_get('name','')})")
+        thr = lab_get("thresholds", {})
         lines.append(
             f"  🎯 Temp {thr.get('t_low','?')}..{thr.get('t_high','?')}  Hum {thr.get('h_low','?')}..{thr.get('h_high','?')}"
         )
-        lines.append(f"  ⏱ Last sensor: {fmt_ts(lab.get('last_sensor_seen','never'))}")
-        if lab.get("alerts", {}).get("sensor_offline"):
+        lines.append(f"  ⏱ Last sensor: {fmt_ts(lab_get('last_sensor_seen','never'))}")
+        if lab_get("alerts", {}).get("sensor_offline"):
             lines.append("  ⚠️ Sensor offline")
-        for s in lab.get("sensors", []):
+        for s in lab_get("sensors", []):
             rd = s.get("reading") or {}
             lines.append(
                 f"   🌡️ {s.get('sensor_id')}: T={fmt_val(rd.get('t'))}°C  H={fmt_val(rd.get('h'))}%"
             )
-        for a in lab.get("actuators", []):
+        for a in lab_get("actuators", []):
             st = a.get("state") or {}
             lines.append(
                 f"   ⚙️ {a.get('actuator_id')} ({a.get('type','')}): {st.get('state','?')}"
             )
-        lines.append("")
-    return "\n".join(lines).strip()
+    return "\n".join(lines)
 
 
-def track_alert(lab_id, kind):
-    _last_alert[(lab_id, kind)] = int(time.time())
+def track_alert(lab_id, kind, now=None):
+    _last_alert[(lab_id, kind)] = int(now if now is not None else time.time())
 
 
-def should_alert(lab_id, kind):
+def should_alert(lab_id, kind, now=None):
+    if now is None:
+        now = int(time.time())
     last = _last_alert.get((lab_id, kind), 0)
-    return (int(time.time()) - last) >= ALERT_COOLDOWN_SEC
+    return (now - last) >= ALERT_COOLDOWN_SEC
+
+
+def broadcast(bot, msg):
+    """Send msg to every permitted known chat, fanning out on the pool."""
+    allowed_ids = load_permissions()
+    recipients = [c for c in _CHATS_SNAPSHOT if (not allowed_ids) or c in allowed_ids]
+    for _ in EXEC.map(lambda chat: bot.sendMessage(chat, msg), recipients):
+        pass
+
+
+# Whether the registry exposes GET /alerts/stream; probed once like the bulk
+# command route so older registries fall back to fixed-interval polling.
+_ALERT_STREAM = {"supported": True}
+
+
+def _handle_alert_event(bot, event):
+    lab_id = event.get("lab_id")
+    kind = event.get("kind", "")
+    if not lab_id or kind not in ("t_high", "t_low", "h_high", "h_low"):
+        return
+    now = int(time.time())
+    if not should_alert(lab_id, kind, now):
+        return
+    metric = "temp" if kind.startswith("t_") else "humidity"
+    op = ">" if kind.endswith("_high") else "<"
+    msg = f"⚠️ {lab_id}: {metric} {fmt_val(event.get('value'))} {op} {fmt_val(event.get('limit'))} ({event.get('sensor_id')})"
+    broadcast(bot, msg)
+    track_alert(lab_id, kind, now)
+
+
+def _iter_lines(resp):
+    """Yield newline-delimited lines from a streaming urllib3 response."""
+    buf = b""
+    for chunk in resp.stream(1024):
+        buf += chunk
+        while b"\n" in buf:
+            line, buf = buf.split(b"\n", 1)
+            yield line.rstrip(b"\r")
+    if buf:
+        yield buf
+
+
+def _stream_alerts(bot):
+    """Consume SSE frames from /alerts/stream until the server disconnects.
+
+    Returns False when the registry does not serve the route.
+    """
+    resp = POOL.request(
+        "GET",
+        _url("alerts/stream"),
+        preload_content=False,
+        timeout=urllib3.Timeout(connect=5, read=None),
+    )
+    ctype = resp.headers.get("Content-Type", "")
+    if resp.status == 404 or not ctype.startswith("text/event-stream"):
+        # Small detection reply: consume it so the socket goes back clean.
+        resp.drain_conn()
+        return False
+    try:
+        for line in _iter_lines(resp):
+            if not line or not line.startswith(b"data:"):
+                continue
+            try:
+                event = _loads(line[5:].strip())
+            except Exception:
+                continue
+            if _CHATS_SNAPSHOT:
+                _handle_alert_event(bot, event)
+        return True
+    finally:
+        # Abandoning a half-read stream: drop the connection, don't pool it.
+        resp.close()
+
+
+# Digest of the last labs payload scanned, so an unchanged /status response
+# (no new readings) skips the threshold scan entirely.
+_POLL_STATE = {"digest": None}
+
+
+def _poll_alerts_once(bot):
+    """Scan /status for threshold breaches; returns False on registry error."""
+    data = _get_status_cached()
+    if data.get("error"):
+        return False
+    labs = data.get("labs", [])
+    digest = hashlib.blake2b(_dumps(labs)).digest()
+    if digest == _POLL_STATE["digest"]:
+        return True
+    _POLL_STATE["digest"] = digest
+    now = int(time.time())
+    for lab in labs:
+        lab_id = lab.get("lab_id")
+        thr = lab.get("thresholds", {})
+        t_hi = thr.get("t_high", 999)
+        t_lo = thr.get("t_low", -999)
+        h_hi = thr.get("h_high", 999)
+        h_lo = thr.get("h_low", -999)
+        for sensor in lab.get("sensors", []):
+            rd = sensor.get("reading") or {}
+            sid = sensor.get("sensor_id")
+            t = rd.get("t")
+            h = rd.get("h")
+            if t is not None:
+                if t >= t_hi and should_alert(lab_id, "t_high", now):
+                    broadcast(bot, f"⚠️ {lab_id}: temp {fmt_val(t)} > {fmt_val(t_hi)} ({sid})")
+                    track_alert(lab_id, "t_high", now)
+                if t <= t_lo and should_alert(lab_id, "t_low", now):
+                    broadcast(bot, f"⚠️ {lab_id}: temp {fmt_val(t)} < {fmt_val(t_lo)} ({sid})")
+                    track_alert(lab_id, "t_low", now)
+            if h is not None:
+                if h >= h_hi and should_alert(lab_id, "h_high", now):
+                    broadcast(bot, f"⚠️ {lab_id}: humidity {fmt_val(h)} > {fmt_val(h_hi)} ({sid})")
+                    track_alert(lab_id, "h_high", now)
+                if h <= h_lo and should_alert(lab_id, "h_low", now):
+                    broadcast(bot, f"⚠️ {lab_id}: humidity {fmt_val(h)} < {fmt_val(h_lo)} ({sid})")
+                    track_alert(lab_id, "h_low", now)
+    return True
 
 
 def poll_alerts(bot):
+    backoff = 1.0
+    poll_backoff = ALERT_POLL_SEC
     while True:
-        if not KNOWN_CHATS:
+        # Nobody to notify: don't hold a stream open or poll the registry.
+        if not _CHATS_SNAPSHOT:
             time.sleep(ALERT_POLL_SEC)
             continue
-        data = _get("status")
-        labs = data.get("labs", [])
-        for lab in labs:
-            lab_id = lab.get("lab_id")
-            thr = lab.get("thresholds", {})
-            for sensor in lab.get("sensors", []):
-                rd = sensor.get("reading") or {}
-                sid = sensor.get("sensor_id")
-                t = rd.get("t")
-                h = rd.get("h")
-                allowed_ids = load_permissions()
-                recipients = [c for c in KNOWN_CHATS if (not allowed_ids) or c in allowed_ids]
-                if t is not None:
-                    if t >= thr.get("t_high", 999) and should_alert(lab_id, "t_high"):
-                        msg = f"⚠️ {lab_id}: temp {fmt_val(t)} > {fmt_val(thr.get('t_high'))} ({sid})"
-                        for chat in recipients:
-                            bot.sendMessage(chat, msg)
-                        track_alert(lab_id, "t_high")
-                    if t <= thr.get("t_low", -999) and should_alert(lab_id, "t_low"):
-                        msg = f"⚠️ {lab_id}: temp {fmt_val(t)} < {fmt_val(thr.get('t_low'))} ({sid})"
-                        for chat in recipients:
-                            bot.sendMessage(chat, msg)
-                        track_alert(lab_id, "t_low")
-                if h is not None:
-                    if h >= thr.get("h_high", 999) and should_alert(lab_id, "h_high"):
-                        msg = f"⚠️ {lab_id}: humidity {fmt_val(h)} > {fmt_val(thr.get('h_high'))} ({sid})"
-                        for chat in recipients:
-                            bot.sendMessage(chat, msg)
-                        track_alert(lab_id, "h_high")
-                    if h <= thr.get("h_low", -999) and should_alert(lab_id, "h_low"):
-                        msg = f"⚠️ {lab_id}: humidity {fmt_val(h)} < {fmt_val(thr.get('h_low'))} ({sid})"
-                        for chat in recipients:
-                            bot.sendMessage(chat, msg)
-                        track_alert(lab_id, "h_low")
+        if _ALERT_STREAM["supported"]:
+            try:
+                if _stream_alerts(bot):
+                    # Established stream dropped; reconnect promptly.
+                    backoff = 1.0
+                else:
+                    _ALERT_STREAM["supported"] = False
+                    continue
+            except Exception:
+                pass
+            time.sleep(backoff)
+            backoff = min(backoff * 2, ALERT_POLL_SEC)
+            continue
+        if not _poll_alerts_once(bot):
+            # Registry unreachable: back off instead of hammering it every tick.
+            time.sleep(poll_backoff)
+            poll_backoff = min(poll_backoff * 2, 600)
+            continue
+        poll_backoff = ALERT_POLL_SEC
         time.sleep(ALERT_POLL_SEC)
 
 
+def _send_result(chat_id, res):
+    bot.sendMessage(chat_id, "OK" if res.get("ok") else f"Error: {res.get('error','unknown')}")
+
+
+def _delete(endpoint):
+    try:
+        r = POOL.request("DELETE", _url(endpoint), timeout=5)
+        return _parse_result(r.data)
+    except Exception:
+        return {"error": "registry unreachable"}
+
+
+def _cmd_menu(chat_id, parts):
+    register_chat(chat_id)
+    send_menu(chat_id)
+
+
+def _cmd_status(chat_id, parts):
+    bot.sendMessage(chat_id, fmt_status(_get("status")))
+
+
+def _cmd_list_labs(chat_id, parts):
+    send_labs_list(chat_id)
+
+
+_TURN_USAGE = {
+    "/turn_on": "Usage: /turn_on <lab_id> <actuator_id>",
+    "/turn_off": "Usage: /turn_off <lab_id> <actuator_id>",
+}
+
+
+def _cmd_turn(chat_id, parts):
+    cmd = parts[0].lower()
+    if len(parts) != 3:
+        bot.sendMessage(chat_id, _TURN_USAGE[cmd])
+        return
+    action = "ON" if cmd == "/turn_on" else "OFF"
+    payload = {"lab_id": parts[1], "actuator_id": parts[2], "action": action, "source": "bot"}
+    _send_result(chat_id, _post("command", payload))
+
+
+def _cmd_add_lab(chat_id, parts):
+    if len(parts) < 3:
+        bot.sendMessage(chat_id, "Usage: /add_lab <lab_id> \"<name>\" [notes]")
+        return
+    lab_id, name = parts[1], parts[2]
+    notes = " ".join(parts[3:]) if len(parts) > 3 else ""
+    _send_result(chat_id, _post("labs", {"lab_id": lab_id, "name": name, "notes": notes}))
+
+
+def _cmd_remove_lab(chat_id, parts):
+    if len(parts) != 2:
+        bot.sendMessage(chat_id, "Usage: /remove_lab <lab_id>")
+        return
+    _send_result(chat_id, _delete(f"lab/{parts[1]}"))
+
+
+def _cmd_add_sensor(chat_id, parts):
+    if len(parts) != 4:
+        bot.sendMessage(chat_id, "Usage: /add_sensor <lab_id> <sensor_id> <type>")
+        return
+    _send_result(chat_id, _post("sensors", {"lab_id": parts[1], "sensor_id": parts[2], "type": parts[3]}))
+
+
+def _cmd_remove_sensor(chat_id, parts):
+    if len(parts) != 2:
+        bot.sendMessage(chat_id, "Usage: /remove_sensor <sensor_id>")
+        return
+    _send_result(chat_id, _delete(f"sensor/{parts[1]}"))
+
+
+def _cmd_add_actuator(chat_id, parts):
+    if len(parts) != 4:
+        bot.sendMessage(chat_id, "Usage: /add_actuator <lab_id> <actuator_id> <type>")
+        return
+    _send_result(chat_id, _post("actuators", {"lab_id": parts[1], "actuator_id": parts[2], "type": parts[3]}))
+
+
+def _cmd_remove_actuator(chat_id, parts):
+    if len(parts) != 2:
+        bot.sendMessage(chat_id, "Usage: /remove_actuator <actuator_id>")
+        return
+    _send_result(chat_id, _delete(f"actuator/{parts[1]}"))
+
+
+def _cmd_unknown(chat_id, parts):
+    bot.sendMessage(chat_id, "Unknown command. Use /help")
+
+
+# O(1) command dispatch; aliases map to the same handler.
+COMMANDS = {
+    "/start": _cmd_menu,
+    "/help": _cmd_menu,
+    "/menu": _cmd_menu,
+    "/status": _cmd_status,
+    "/list_labs": _cmd_list_labs,
+    "/turn_on": _cmd_turn,
+    "/turn_off": _cmd_turn,
+    "/add_lab": _cmd_add_lab,
+    "/remove_lab": _cmd_remove_lab,
+    "/add_sensor": _cmd_add_sensor,
+    "/remove_sensor": _cmd_remove_sensor,
+    "/add_actuator": _cmd_add_actuator,
+    "/remove_actuator": _cmd_remove_actuator,
+}
+
+# Reply-keyboard shortcuts that just answer with a canned template.
+SHORTCUT_REPLIES = {
+    "⚡ Turn ON": "Use: /turn_on <lab_id> <actuator_id>",
+    "turn on": "Use: /turn_on <lab_id> <actuator_id>",
+    "⏻ Turn OFF": "Use: /turn_off <lab_id> <actuator_id>",
+    "turn off": "Use: /turn_off <lab_id> <actuator_id>",
+    "➕ Add Lab": 'Template: /add_lab <lab_id> "<name>" [notes]',
+    "add lab": 'Template: /add_lab <lab_id> "<name>" [notes]',
+    "➖ Remove Lab": "Template: /remove_lab <lab_id>",
+    "remove lab": "Template: /remove_lab <lab_id>",
+    "➕ Add Sensor": "Template: /add_sensor <lab_id> <sensor_id> <type>",
+    "add sensor": "Template: /add_sensor <lab_id> <sensor_id> <type>",
+    "➖ Remove Sensor": "Template: /remove_sensor <sensor_id>",
+    "remove sensor": "Template: /remove_sensor <sensor_id>",
+    "➕ Add Actuator": "Template: /add_actuator <lab_id> <actuator_id> <type>",
+    "add actuator": "Template: /add_actuator <lab_id> <actuator_id> <type>",
+    "➖ Remove Actuator": "Template: /remove_actuator <actuator_id>",
+    "remove actuator": "Template: /remove_actuator <actuator_id>",
+}
+
+
 def handle(msg):
     glance = telepot.glance(msg, flavor="chat")
     if glance and glance[0] == "text":
@@ -172,142 +487,30 @@ def handle(msg):
             bot.sendMessage(chat_id, "Not authorized.")
             return
         text = msg["text"].strip()
-        parts = shlex.split(text)
+        # shlex is only needed for quoted arguments (e.g. /add_lab names);
+        # plain commands take the cheap whitespace split.
+        parts = text.split() if ('"' not in text and "'" not in text) else shlex.split(text)
         if not parts:
             return
-        cmd = parts[0].lower()
         # Handle reply keyboard shortcuts
         if text in ("📊 Status", "status"):
-            data = _get("status")
-            bot.sendMessage(chat_id, fmt_status(data))
+            _cmd_status(chat_id, parts)
             return
         if text in ("🏷 Labs", "labs"):
             send_labs_list(chat_id)
             return
-        if text in ("⚡ Turn ON", "turn on"):
-            bot.sendMessage(chat_id, "Use: /turn_on <lab_id> <actuator_id>")
-            return
-        if text in ("⏻ Turn OFF", "turn off"):
-            bot.sendMessage(chat_id, "Use: /turn_off <lab_id> <actuator_id>")
-            return
-        if text in ("➕ Add Lab", "add lab"):
-            bot.sendMessage(chat_id, 'Template: /add_lab <lab_id> "<name>" [notes]')
-            return
-        if text in ("➖ Remove Lab", "remove lab"):
-            bot.sendMessage(chat_id, "Template: /remove_lab <lab_id>")
-            return
-        if text in ("➕ Add Sensor", "add sensor"):
-            bot.sendMessage(chat_id, "Template: /add_sensor <lab_id> <sensor_id> <type>")
-            return
-        if text in ("➖ Remove Sensor", "remove sensor"):
-            bot.sendMessage(chat_id, "Template: /remove_sensor <sensor_id>")
-            return
-        if text in ("➕ Add Actuator", "add actuator"):
-            bot.sendMessage(chat_id, "Template: /add_actuator <lab_id> <actuator_id> <type>")
-            return
-        if text in ("➖ Remove Actuator", "remove actuator"):
-            bot.sendMessage(chat_id, "Template: /remove_actuator <actuator_id>")
-            return
-
-        if cmd in ("/start", "/help"):
-            KNOWN_CHATS.add(chat_id)
-            send_menu(chat_id)
-            return
-
-        if cmd == "/menu":
-            KNOWN_CHATS.add(chat_id)
-            send_menu(chat_id)
-            return
-
-        if cmd == "/status":
-            data = _get("status")
-            bot.sendMessage(chat_id, fmt_status(data))
-            return
-
-        if cmd == "/list_labs":
-            send_labs_list(chat_id)
-            return
-
-        if cmd in ("/turn_on", "/turn_off"):
-            action = "ON" if cmd == "/turn_on" else "OFF"
-            if len(parts) != 3:
-                bot.sendMessage(chat_id, f"Usage: {cmd} <lab_id> <actuator_id>")
-                return
-            payload = {"lab_id": parts[1], "actuator_id": parts[2], "action": action, "source": "bot"}
-            res = _post("command", payload)
-            bot.sendMessage(chat_id, "OK" if res.get("ok") else f"Error: {res.get('error','unknown')}")
-            return
-
-        if cmd == "/add_lab":
-            if len(parts) < 3:
-                bot.sendMessage(chat_id, "Usage: /add_lab <lab_id> \"<name>\" [notes]")
-                return
-            lab_id, name = parts[1], parts[2]
-            notes = " ".join(parts[3:]) if len(parts) > 3 else ""
-            res = _post("labs", {"lab_id": lab_id, "name": name, "notes": notes})
-            bot.sendMessage(chat_id, "OK" if res.get("ok") else f"Error: {res.get('error','unknown')}")
+        reply = SHORTCUT_REPLIES.get(text)
+        if reply:
+            bot.sendMessage(chat_id, reply)
             return
-
-        if cmd == "/remove_lab":
-            if len(parts) != 2:
-                bot.sendMessage(chat_id, "Usage: /remove_lab <lab_id>")
-                return
-            try:
-                r = requests.delete(f"{REGISTRY_API.rstrip('/')}/lab/{parts[1]}", timeout=5)
-                res = r.json()
-            except Exception:
-                res = {"error": "registry unreachable"}
-            bot.sendMessage(chat_id, "OK" if res.get("ok") else f"Error: {res.get('error','unknown')}")
-            return
-
-        if cmd == "/add_sensor":
-            if len(parts) != 4:
-                bot.sendMessage(chat_id, "Usage: /add_sensor <lab_id> <sensor_id> <type>")
-                return
-            res = _post("sensors", {"lab_id": parts[1], "sensor_id": parts[2], "type": parts[3]})
-            bot.sendMessage(chat_id, "OK" if res.get("ok") else f"Error: {res.get('error','unknown')}")
-            return
-
-        if cmd == "/remove_sensor":
-            if len(parts) != 2:
-                bot.sendMessage(chat_id, "Usage: /remove_sensor <sensor_id>")
-                return
-            try:
-                r = requests.delete(f"{REGISTRY_API.rstrip('/')}/sensor/{parts[1]}", timeout=5)
-                res = r.json()
-            except Exception:
-                res = {"error": "registry unreachable"}
-            bot.sendMessage(chat_id, "OK" if res.get("ok") else f"Error: {res.get('error','unknown')}")
-            return
-
-        if cmd == "/add_actuator":
-            if len(parts) != 4:
-                bot.sendMessage(chat_id, "Usage: /add_actuator <lab_id> <actuator_id> <type>")
-                return
-            res = _post("actuators", {"lab_id": parts[1], "actuator_id": parts[2], "type": parts[3]})
-            bot.sendMessage(chat_id, "OK" if res.get("ok") else f"Error: {res.get('error','unknown')}")
-            return
-
-        if cmd == "/remove_actuator":
-            if len(parts) != 2:
-                bot.sendMessage(chat_id, "Usage: /remove_actuator <actuator_id>")
-                return
-            try:
-                r = requests.delete(f"{REGISTRY_API.rstrip('/')}/actuator/{parts[1]}", timeout=5)
-                res = r.json()
-            except Exception:
-                res = {"error": "registry unreachable"}
-            bot.sendMessage(chat_id, "OK" if res.get("ok") else f"Error: {res.get('error','unknown')}")
-            return
-
-        bot.sendMessage(chat_id, "Unknown command. Use /help")
+        COMMANDS.get(parts[0].lower(), _cmd_unknown)(chat_id, parts)
     else:
         # handle inline button presses
         flavor = telepot.flavor(msg)
         if flavor == "callback_query":
             query_id, from_id, data = telepot.glance(msg, flavor="callback_query")
             if data == "status":
-                KNOWN_CHATS.add(from_id)
+                register_chat(from_id)
                 bot.sendMessage(from_id, fmt_status(_get("status")))
             elif data == "list_labs":
                 send_labs_list(from_id)
@@ -331,51 +534,88 @@ def handle(msg):
             bot.answerCallbackQuery(query_id)
 
 
+# Whether the registry exposes POST /command/bulk; probed once and cached so
+# older registries fall back to per-actuator commands without re-probing.
+_BULK_COMMANDS = {"supported": True}
+
+
+def _bulk_unsupported(res):
+    err = res.get("error") or ""
+    return res.get("ok") is None and ("missing fields" in err or "invalid endpoint" in err)
+
+
 def do_all(chat_id, lab_id, action):
-    status = _get("status")
+    status = _get_status_cached()
     labs = [l for l in status.get("labs", []) if l.get("lab_id") == lab_id]
     if not labs:
         bot.sendMessage(chat_id, "Lab not found.")
         return
+    actuator_ids = [a.get("actuator_id") for a in labs[0].get("actuators", [])]
+    if not actuator_ids:
+        bot.sendMessage(chat_id, "No actuators in this lab.")
+        return
     errors = []
-    for act in labs[0].get("actuators", []):
-        payload = {"lab_id": lab_id, "actuator_id": act.get("actuator_id"), "action": action, "source": "bot"}
-        res = _post("command", payload)
+    if _BULK_COMMANDS["supported"]:
+        payload = {"lab_id": lab_id, "action": action, "actuator_ids": actuator_ids, "source": "bot"}
+        res = _post("command/bulk", payload)
+        if _bulk_unsupported(res):
+            _BULK_COMMANDS["supported"] = False
+        else:
+            if not res.get("ok"):
+                err_map = res.get("errors") or {}
+                if err_map:
+                    errors = [f"{aid}: {err}" for aid, err in err_map.items()]
+                else:
+                    errors = [res.get("error", "unknown")]
+            bot.sendMessage(chat_id, "Done." if not errors else "\n".join(errors))
+            return
+    # Registry without the bulk route: issue the per-actuator commands
+    # concurrently so the round-trips overlap instead of adding up.
+    futures = {
+        EXEC.submit(
+            _post, "command", {"lab_id": lab_id, "actuator_id": aid, "action": action, "source": "bot"}
+        ): aid
+        for aid in actuator_ids
+    }
+    for future in concurrent.futures.as_completed(futures):
+        res = future.result()
         if not res.get("ok"):
-            errors.append(f"{act.get('actuator_id')}: {res.get('error','unknown')}")
+            errors.append(f"{futures[future]}: {res.get('error','unknown')}")
     bot.sendMessage(chat_id, "Done." if not errors else "\n".join(errors))
 
 
+# Built once at import: the /help text and reply keyboard never change.
+HELP_TEXT = (
+    "🤖 Temp/Humidity Bot\n"
+    "Use buttons or commands:\n"
+    "• /status – full status\n"
+    "• /list_labs – list labs\n"
+    "• /turn_on <lab_id> <actuator_id>\n"
+    "• /turn_off <lab_id> <actuator_id>\n"
+    "• /add_lab <lab_id> \"name\" [notes]\n"
+    "• /remove_lab <lab_id>\n"
+    "• /add_sensor <lab_id> <sensor_id> <type>\n"
+    "• /remove_sensor <sensor_id>\n"
+    "• /add_actuator <lab_id> <actuator_id> <type>\n"
+    "• /remove_actuator <actuator_id>\n"
+    "Examples: lab_id=lab1, actuator_id=lab1_fan_1, sensor_id=lab1_temp_1\n"
+)
+REPLY_KB = ReplyKeyboardMarkup(
+    keyboard=[
+        ["📊 Status", "🏷 Labs"],
+        ["⚡ Turn ON", "⏻ Turn OFF"],
+        ["➕ Add Lab", "➖ Remove Lab"],
+        ["➕ Add Sensor", "➖ Remove Sensor"],
+        ["➕ Add Actuator", "➖ Remove Actuator"],
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=False,
+)
+
+
 def send_menu(chat_id):
-    KNOWN_CHATS.add(chat_id)
-    labs = get_labs()
-    help_text = (
-        "🤖 Temp/Humidity Bot\n"
-        "Use buttons or commands:\n"
-        "• /status – full status\n"
-        "• /list_labs – list labs\n"
-        "• /turn_on <lab_id> <actuator_id>\n"
-        "• /turn_off <lab_id> <actuator_id>\n"
-        "• /add_lab <lab_id> \"name\" [notes]\n"
-        "• /remove_lab <lab_id>\n"
-        "• /add_sensor <lab_id> <sensor_id> <type>\n"
-        "• /remove_sensor <sensor_id>\n"
-        "• /add_actuator <lab_id> <actuator_id> <type>\n"
-        "• /remove_actuator <actuator_id>\n"
-        "Examples: lab_id=lab1, actuator_id=lab1_fan_1, sensor_id=lab1_temp_1\n"
-    )
-    reply_kb = ReplyKeyboardMarkup(
-        keyboard=[
-            ["📊 Status", "🏷 Labs"],
-            ["⚡ Turn ON", "⏻ Turn OFF"],
-            ["➕ Add Lab", "➖ Remove Lab"],
-            ["➕ Add Sensor", "➖ Remove Sensor"],
-            ["➕ Add Actuator", "➖ Remove Actuator"],
-        ],
-        resize_keyboard=True,
-        one_time_keyboard=False,
-    )
-    bot.sendMessage(chat_id, help_text, reply_markup=reply_kb)
+    register_chat(chat_id)
+    bot.sendMessage(chat_id, HELP_TEXT, reply_markup=REPLY_KB)
 
 
 def send_lab_controls(chat_id, lab_id):
@@ -2,8 +2,10 @@
 
 from __future__ import annotations
 
+import json
 import os
 import threading
+import time
 from datetime import datetime
 from typing import Dict, List, Optional
 
@@ -11,9 +13,15 @@ import cherrypy
 import logging
 import requests
 
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional fast path
+    np = None
+
 from catalog.catalog_store import bump_top_last_update, read_json, write_json
 from catalog_registry.validators import (
     validate_actuator,
+    validate_bulk_command,
     validate_command,
     validate_lab,
     validate_sensor,
@@ -47,6 +55,10 @@ class RegistryAPI:
     def __init__(self):
         self.logger = logging.getLogger("RegistryAPI")
         self._lock = threading.RLock()
+        # Alert evaluation shared across stream ticks and subscribers; one
+        # snapshot fetch per TTL instead of one per subscriber per tick.
+        self._alerts_lock = threading.Lock()
+        self._alerts_cache = {"t": 0.0, "v": None}
         self.manager = None
         self._command_client: Optional[MqttClient] = None
         self._load_catalogs()
@@ -173,6 +185,89 @@ class RegistryAPI:
             )
         return {"labs": labs_payload, "ts": _ts()}
 
+    def _evaluate_alerts_cached(self, ttl: float = 2.0) -> List[dict]:
+        """TTL-cached _evaluate_alerts so concurrent subscribers share one pass."""
+        now = time.monotonic()
+        cache = self._alerts_cache
+        if cache["v"] is not None and now - cache["t"] < ttl:
+            return cache["v"]
+        with self._alerts_lock:
+            now = time.monotonic()
+            if cache["v"] is not None and now - cache["t"] < ttl:
+                return cache["v"]
+            alerts = self._evaluate_alerts()
+            cache["v"] = alerts
+            cache["t"] = now
+            return alerts
+
+    def _evaluate_alerts(self) -> List[dict]:
+        """Return one alert record per out-of-threshold sensor reading."""
+        alerts: List[dict] = []
+        for lab in self._status_payload()["labs"]:
+            lab_id = lab["lab_id"]
+            thr = lab.get("thresholds", {})
+            sensors = lab.get("sensors", [])
+            if not sensors:
+                continue
+            if np is not None:
+                # Pack readings into arrays and compare all sensors at once;
+                # NaN (missing reading) never satisfies any comparison.
+                readings = [s.get("reading") or {} for s in sensors]
+                count = len(readings)
+                t = np.fromiter(
+                    (r["t"] if r.get("t") is not None else np.nan for r in readings), dtype=float, count=count
+                )
+                h = np.fromiter(
+                    (r["h"] if r.get("h") is not None else np.nan for r in readings), dtype=float, count=count
+                )
+                flagged = (
+                    ("t_high", np.nonzero(t >= thr.get("t_high", 999))[0], t),
+                    ("t_low", np.nonzero(t <= thr.get("t_low", -999))[0], t),
+                    ("h_high", np.nonzero(h >= thr.get("h_high", 999))[0], h),
+                    ("h_low", np.nonzero(h <= thr.get("h_low", -999))[0], h),
+                )
+                for kind, indexes, values in flagged:
+                    limit = thr.get(kind)
+                    for idx in indexes:
+                        alerts.append(
+                            {
+                                "lab_id": lab_id,
+                                "sensor_id": sensors[int(idx)]["sensor_id"],
+                                "kind": kind,
+                                "value": float(values[idx]),
+                                "limit": limit,
+                            }
+                        )
+                continue
+            t_hi = thr.get("t_high", 999)
+            t_lo = thr.get("t_low", -999)
+            h_hi = thr.get("h_high", 999)
+            h_lo = thr.get("h_low", -999)
+            for sensor in sensors:
+                reading = sensor.get("reading") or {}
+                sensor_id = sensor["sensor_id"]
+                t = reading.get("t")
+                h = reading.get("h")
+                if t is not None:
+                    if t >= t_hi:
+                        alerts.append(
+                            {"lab_id": lab_id, "sensor_id": sensor_id, "kind": "t_high", "value": t, "limit": thr.get("t_high")}
+                        )
+                    if t <= t_lo:
+                        alerts.append(
+                            {"lab_id": lab_id, "sensor_id": sensor_id, "kind": "t_low", "value": t, "limit": thr.get("t_low")}
+                        )
+                if h is not None:
+                    if h >= h_hi:
+                        alerts.append(
+                            {"lab_id": lab_id, "sensor_id": sensor_id, "kind": "h_high", "value": h, "limit": thr.get("h_high")}
+                        )
+                    if h <= h_lo:
+                        alerts.append(
+                            {"lab_id": lab_id, "sensor_id": sensor_id, "kind": "h_low", "value": h, "limit": thr.get("h_low")}
+                        )
+        return alerts
+
     # ------------------------------------------------------------------ handlers
     @cherrypy.tools.json_out()
     def OPTIONS(self, *uri, **params):
@@ -196,6 +291,7 @@ class RegistryAPI:
                     "/threshold/{lab_id}",
                     "/permissions",
                     "/status",
+                    "/alerts/stream",
                 ],
             }
 
@@ -326,6 +422,45 @@ class RegistryAPI:
             self.logger.info("Actuator created %s lab=%s type=%s", body["actuator_id"], body["lab_id"], body["type"])
             return {"ok": True, "msg": "actuator created"}
 
+        if path == "command" and len(uri) > 1 and uri[1].lower() == "bulk":
+            err = validate_bulk_command(body)
+            if err:
+                return {"error": err}
+            lab_id = body["lab_id"]
+            if not self._find_lab(lab_id):
+                return {"error": "lab not found"}
+            source = body.get("source", "manual")
+            errors: Dict[str, str] = {}
+            with self._lock:
+                targets = []
+                for actuator_id in body["actuator_ids"]:
+                    idx = self._actuator_index(actuator_id)
+                    if idx is None:
+                        errors[actuator_id] = "actuator_id not found"
+                        continue
+                    if self.devices["actuators"][idx]["lab_id"] != lab_id:
+                        errors[actuator_id] = "actuator not in specified lab"
+                        continue
+                    targets.append(actuator_id)
+            for actuator_id in targets:
+                if self.controller_enabled and self.manager:
+                    self.manager.send_command(lab_id, actuator_id, body["action"], source=source)
+                elif self._command_client:
+                    actuator_bridge.send_command(
+                        self._command_client, lab_id, actuator_id, body["action"], source=source
+                    )
+            self.logger.info(
+                "Bulk command lab=%s action=%s actuators=%d errors=%d source=%s",
+                lab_id,
+                body["action"],
+                len(targets),
+                len(errors),
+                source,
+            )
+            if errors:
+                return {"ok": False, "errors": errors, "dispatched": targets}
+            return {"ok": True, "msg": "commands dispatched", "dispatched": targets}
+
         if path == "command":
             err = validate_command(body)
             if err:
@@ -526,6 +661,42 @@ class RegistryAPI:
         return {"error": "invalid endpoint"}
 
 
+class AlertStream:
+    """Server-sent-events endpoint pushing threshold alerts to subscribers.
+
+    Clients open one long-lived GET instead of polling /status; each
+    out-of-threshold reading is emitted as a ``data: {json}`` frame and a
+    comment frame keeps idle connections alive.
+    """
+
+    exposed = True
+
+    def __init__(self, registry: RegistryAPI, check_sec: float = 2.0):
+        self.registry = registry
+        self.check_sec = check_sec
+
+    def GET(self, *uri, **params):
+        cherrypy.response.headers["Content-Type"] = "text/event-stream"
+        cherrypy.response.headers["Cache-Control"] = "no-cache"
+        registry = self.registry
+        check_sec = self.check_sec
+
+        def _stream():
+            yield b": connected\n\n"
+            while True:
+                alerts = registry._evaluate_alerts_cached(ttl=check_sec)
+                if alerts:
+                    for alert in alerts:
+                        yield f"data: {json.dumps(alert)}\n\n".encode("utf-8")
+                else:
+                    yield b": keepalive\n\n"
+                time.sleep(check_sec)
+
+        return _stream()
+
+    GET._cp_config = {"response.stream": True}
+
+
 def run():
     logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     def _cors():
@@ -540,8 +711,17 @@ def run():
             "tools.cors.on": True,
         }
     }
+    stream_conf = {
+        "/": {
+            "request.dispatch": cherrypy.dispatch.MethodDispatcher(),
+            "tools.cors.on": True,
+            "response.stream": True,
+        }
+    }
     cherrypy.config.update({"server.socket_host": "0.0.0.0", "server.socket_port": 8080})
-    cherrypy.tree.mount(RegistryAPI(), "/", conf)
+    api = RegistryAPI()
+    cherrypy.tree.mount(api, "/", conf)
+    cherrypy.tree.mount(AlertStream(api), "/alerts/stream", stream_conf)
     cherrypy.engine.start()
     cherrypy.engine.block()
 
@@ -61,3 +61,20 @@ def validate_command(payload):
     if action not in ("ON", "OFF"):
         return "action must be either 'ON' or 'OFF'"
     return None
+
+def validate_bulk_command(payload):
+    miss = require_keys(payload, ["lab_id", "actuator_ids", "action"])
+    if miss:
+        return f"missing fields: {', '.join(miss)}"
+    if not is_snake_id(payload["lab_id"]):
+        return "lab_id must be snake_case"
+    ids = payload["actuator_ids"]
+    if not isinstance(ids, list) or not ids:
+        return "actuator_ids must be a non-empty list"
+    for actuator_id in ids:
+        if not is_snake_id(actuator_id):
+            return "actuator_ids must be snake_case"
+    action = str(payload["action"]).upper()
+    if action not in ("ON", "OFF"):
+        return "action must be either 'ON' or 'OFF'"
+    return None